@@ -1,9 +1,21 @@
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 models_dir = Path()
 ext = ".pdparams"
-for model_path in models_dir.glob("*/*" + ext):
-    md5 = hashlib.md5(model_path.read_bytes()).hexdigest()
+chunk_size = 1 << 20
+
+
+def update_md5(model_path):
+    md5 = hashlib.md5()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            md5.update(chunk)
     md5_path = str(model_path)[: -len(ext)] + ".md5"
-    Path(md5_path).write_text(md5)
+    Path(md5_path).write_text(md5.hexdigest())
+
+
+if __name__ == "__main__":
+    with ProcessPoolExecutor() as executor:
+        list(executor.map(update_md5, models_dir.glob("*/*" + ext)))
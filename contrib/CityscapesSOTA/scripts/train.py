@@ -20,7 +20,8 @@ import shutil
 import paddle
 import paddle.nn.functional as F
 
-from paddleseg.utils import TimeAverager, calculate_eta, resume, logger
+from paddleseg.utils import (TimeAverager, calculate_eta, resume, logger,
+                             compute_binary_edge)
 from paddleseg.core.val import evaluate
 
 
@@ -138,6 +139,9 @@ def train(model,
             edges = None
             if len(data) == 3:
                 edges = data[2].astype('int64')
+            elif getattr(train_dataset, 'edge', False):
+                edges = compute_binary_edge(
+                    labels, radius=2, num_classes=train_dataset.num_classes)
 
             if hasattr(train_dataset,
                        'shuffle') and iter % iters_per_epoch == 0:
@@ -15,16 +15,137 @@
 import os
 import time
 from collections import deque, defaultdict
+import itertools
+import multiprocessing
+import pickle
+from queue import Full
 import shutil
 
 import numpy as np
 import paddle
 import paddle.nn.functional as F
-from paddleseg.utils import TimeAverager, calculate_eta, resume, logger
+from paddleseg.utils import (TimeAverager, calculate_eta, resume, logger,
+                             BFLOAT16_KEYS)
 
 from core.val import evaluate
 
 
+def _float32_to_bfloat16(array):
+    """
+    Round a float32 array to bfloat16, stored as uint16 like Paddle does.
+    """
+    bits = array.view(np.uint32)
+    rounding = ((bits >> 16) & 1) + 0x7FFF
+    return ((bits + rounding) >> 16).astype(np.uint16)
+
+
+# The optimizer states that can be saved in bfloat16. Other states, such as
+# the scalar `beta1_pow_acc`/`beta2_pow_acc` of Adam used for bias correction,
+# are kept in float32.
+_BFLOAT16_OPT_KEYS = ('_moment1_', '_moment2_')
+
+
+def _stage_state_dict(state_dict, bfloat16=False, bfloat16_keys=None):
+    """
+    Copy the tensors of a state dict to host memory, in the same layout that
+    `paddle.save` builds, so that it can be serialized by another process.
+    If `bfloat16` is True, float32 tensors with more than one element are rounded
+    to bfloat16, only for the keys containing one of `bfloat16_keys` if it is given.
+    The rounded keys are listed under `BFLOAT16_KEYS` for the loaders to widen them back.
+    """
+    staged = {}
+    name_table = {}
+    rounded_keys = []
+    for key, value in state_dict.items():
+        if isinstance(value, paddle.Tensor):
+            array = value.numpy()
+            staged[key] = array
+            if bfloat16 and array.dtype == np.float32 and array.size > 1 and (
+                    bfloat16_keys is None
+                    or any(k in key for k in bfloat16_keys)):
+                # Left out of the name table so that `paddle.load` keeps it
+                # as a uint16 array instead of converting it to a tensor.
+                staged[key] = _float32_to_bfloat16(array)
+                rounded_keys.append(key)
+            else:
+                name_table[key] = value.name
+        else:
+            staged[key] = value
+    staged['StructuredToParameterName@@'] = name_table
+    if rounded_keys:
+        staged[BFLOAT16_KEYS] = rounded_keys
+    return staged
+
+
+class _RepeatSampler(object):
+    """
+    Repeat a batch sampler endlessly so that the workers of the data loader are kept alive across epochs.
+    """
+
+    def __init__(self, batch_sampler):
+        self.batch_sampler = batch_sampler
+
+    def __iter__(self):
+        while True:
+            for batch_indices in self.batch_sampler:
+                yield batch_indices
+
+    def __len__(self):
+        return len(self.batch_sampler)
+
+
+def _checkpoint_worker(queue):
+    """
+    Write checkpoints and remove stale ones in the background until a `None` is received.
+    """
+    for task in iter(queue.get, None):
+        action, args = task
+        if action == 'save':
+            obj, path = args
+            if pickle.HIGHEST_PROTOCOL >= 5:
+                # Protocol 5 writes the array buffers directly to the file
+                # instead of copying each of them to a bytes object first.
+                # This only covers the write here: the queue hand-off from the
+                # trainer is still pickled with the default protocol.
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    pickle.dump(obj, f, protocol=5)
+            else:
+                paddle.save(obj, path, protocol=4)
+        elif action == 'remove':
+            shutil.rmtree(args)
+
+
+def _put_checkpoint_task(proc, queue, task):
+    """
+    Hand a task to the checkpoint worker, raising an error if the worker has died.
+    """
+    while True:
+        if not proc.is_alive():
+            raise RuntimeError(
+                'The checkpoint worker exited unexpectedly with code {}, the pending checkpoints are lost.'
+                .format(proc.exitcode))
+        try:
+            queue.put(task, timeout=1)
+            return
+        except Full:
+            pass
+
+
+def _stop_checkpoint_worker(proc, queue):
+    """
+    Wait for the checkpoint worker to write the pending checkpoints and exit.
+    """
+    try:
+        _put_checkpoint_task(proc, queue, None)
+    except RuntimeError:
+        pass
+    proc.join()
+    if proc.exitcode != 0:
+        # Nobody reads the queue anymore, so do not wait for it to be flushed at exit.
+        queue.cancel_join_thread()
+
+
 def train(model,
           train_dataset,
           val_dataset=None,
@@ -35,11 +156,12 @@ def train(model,
           resume_model=None,
           save_interval=1000,
           log_iters=10,
-          num_workers=0,
+          num_workers=2,
           use_vdl=False,
           losses=None,
           keep_checkpoint_max=5,
-          eval_begin_iters=None):
+          eval_begin_iters=None,
+          save_bfloat16=False):
     """
     Launch training.
     Args:
@@ -53,11 +175,14 @@ def train(model,
         resume_model (str, optional): The path of resume model.
         save_interval (int, optional): How many iters to save a model snapshot once during training. Default: 1000.
         log_iters (int, optional): Display logging information at every log_iters. Default: 10.
-        num_workers (int, optional): Num workers for data loader. Default: 0.
+        num_workers (int, optional): Num workers for data loader. Default: 2.
         use_vdl (bool, optional): Whether to record the data to VisualDL during training. Default: False.
         losses (dict, optional): A dict of loss, refer to the loss function of the model for details. Default: None.
         keep_checkpoint_max (int, optional): Maximum number of checkpoints to save. Default: 5.
         eval_begin_iters (int): The iters begin evaluation. It will evaluate at iters/2 if it is None. Defalust: None.
+        save_bfloat16 (bool, optional): Whether to save the float32 parameters and the Adam moments of the periodic
+            checkpoints in bfloat16 to halve their size. The other optimizer states and the best model are always
+            saved in full precision. Default: False.
     """
     model.train()
     nranks = paddle.distributed.ParallelEnv().nranks
@@ -67,10 +192,9 @@ def train(model,
     if resume_model is not None:
         start_iter = resume(model, optimizer, resume_model)
 
-    if not os.path.isdir(save_dir):
-        if os.path.exists(save_dir):
-            os.remove(save_dir)
-        os.makedirs(save_dir)
+    if os.path.isfile(save_dir):
+        os.remove(save_dir)
+    os.makedirs(save_dir, exist_ok=True)
 
     if nranks > 1:
         # Initialize parallel environment if not done.
@@ -84,9 +208,10 @@ def train(model,
     batch_sampler = paddle.io.DistributedBatchSampler(
         train_dataset, batch_size=batch_size, shuffle=True, drop_last=True)
 
+    # The sampler is repeated so that the workers are not restarted at every epoch.
     loader = paddle.io.DataLoader(
         train_dataset,
-        batch_sampler=batch_sampler,
+        batch_sampler=_RepeatSampler(batch_sampler),
         num_workers=num_workers,
         return_list=True,
     )
@@ -95,6 +220,16 @@ def train(model,
         from visualdl import LogWriter
         log_writer = LogWriter(save_dir)
 
+    # Serializing checkpoints to disk is done by a child process so that
+    # training only waits for the copy of the parameters to host memory.
+    if local_rank == 0:
+        ctx = multiprocessing.get_context('spawn')
+        # The queue is bounded so that staged state dicts cannot pile up in host memory.
+        ckpt_queue = ctx.Queue(maxsize=2)
+        ckpt_proc = ctx.Process(
+            target=_checkpoint_worker, args=(ckpt_queue, ), daemon=True)
+        ckpt_proc.start()
+
     avg_loss = defaultdict(float)
     iters_per_epoch = len(batch_sampler)
     best_sad = np.inf
@@ -102,14 +237,16 @@ def train(model,
     reader_cost_averager = TimeAverager()
     batch_cost_averager = TimeAverager()
     save_models = deque()
+    if eval_begin_iters is None:
+        eval_begin_iters = iters // 2
+    lr_is_scheduler = isinstance(optimizer._learning_rate,
+                                 paddle.optimizer.lr.LRScheduler)
     batch_start = time.time()
 
-    iter = start_iter
-    while iter < iters:
-        for data in loader:
-            iter += 1
-            if iter > iters:
-                break
+    try:
+        for iter, data in enumerate(
+                itertools.islice(loader, max(iters - start_iter, 0)),
+                start=start_iter + 1):
             reader_cost_averager.record(time.time() - batch_start)
 
             # model input
@@ -123,19 +260,21 @@ def train(model,
 
             optimizer.step()
             lr = optimizer.get_lr()
-            if isinstance(optimizer._learning_rate,
-                          paddle.optimizer.lr.LRScheduler):
+            if lr_is_scheduler:
                 optimizer._learning_rate.step()
             model.clear_gradients()
 
+            # Accumulate on the device to avoid synchronizing at every iter.
             for key, value in loss_dict.items():
-                avg_loss[key] += value.numpy()[0]
+                avg_loss[key] = avg_loss[key] + value.detach()
             batch_cost_averager.record(
                 time.time() - batch_start, num_samples=batch_size)
 
             if (iter) % log_iters == 0 and local_rank == 0:
-                for key, value in avg_loss.items():
-                    avg_loss[key] = value / log_iters
+                loss_values = paddle.stack(list(avg_loss.values())).numpy()
+                loss_values = loss_values.reshape([-1]) / log_iters
+                for key, value in zip(list(avg_loss.keys()), loss_values):
+                    avg_loss[key] = value
                 remain_iters = iters - iter
                 avg_train_batch_cost = batch_cost_averager.get_average()
                 avg_train_reader_cost = reader_cost_averager.get_average()
@@ -176,18 +315,25 @@ def train(model,
                                                 "iter_{}".format(iter))
                 if not os.path.isdir(current_save_dir):
                     os.makedirs(current_save_dir)
-                paddle.save(model.state_dict(),
-                            os.path.join(current_save_dir, 'model.pdparams'))
-                paddle.save(optimizer.state_dict(),
-                            os.path.join(current_save_dir, 'model.pdopt'))
+                model_state = _stage_state_dict(model.state_dict(),
+                                                save_bfloat16)
+                opt_state = _stage_state_dict(
+                    optimizer.state_dict(),
+                    save_bfloat16,
+                    bfloat16_keys=_BFLOAT16_OPT_KEYS)
+                _put_checkpoint_task(ckpt_proc, ckpt_queue,
+                                     ('save', (model_state, os.path.join(
+                                         current_save_dir, 'model.pdparams'))))
+                _put_checkpoint_task(ckpt_proc, ckpt_queue,
+                                     ('save', (opt_state, os.path.join(
+                                         current_save_dir, 'model.pdopt'))))
                 save_models.append(current_save_dir)
                 if len(save_models) > keep_checkpoint_max > 0:
                     model_to_remove = save_models.popleft()
-                    shutil.rmtree(model_to_remove)
+                    _put_checkpoint_task(ckpt_proc, ckpt_queue,
+                                         ('remove', model_to_remove))
 
             # eval model
-            if eval_begin_iters is None:
-                eval_begin_iters = iters // 2
             if (iter % save_interval == 0 or iter == iters) and (
                     val_dataset is
                     not None) and local_rank == 0 and iter >= eval_begin_iters:
@@ -207,9 +353,11 @@ def train(model,
                         best_sad = sad
                         best_model_iter = iter
                         best_model_dir = os.path.join(save_dir, "best_model")
-                        paddle.save(
-                            model.state_dict(),
-                            os.path.join(best_model_dir, 'model.pdparams'))
+                        model_state = _stage_state_dict(model.state_dict())
+                        _put_checkpoint_task(ckpt_proc, ckpt_queue,
+                                             ('save', (model_state, os.path.join(
+                                                 best_model_dir,
+                                                 'model.pdparams'))))
                     logger.info(
                         '[EVAL] The model with the best validation sad ({:.4f}) was saved at iter {}.'
                         .format(best_sad, best_model_iter))
@@ -219,8 +367,17 @@ def train(model,
                         log_writer.add_scalar('Evaluate/MSE', mse, iter)
 
             batch_start = time.time()
+    finally:
+        if local_rank == 0:
+            # Wait for the pending checkpoints to be written, also when
+            # training fails, so that they are not dropped.
+            _stop_checkpoint_worker(ckpt_proc, ckpt_queue)
 
     # Sleep for half a second to let dataloader release resources.
     time.sleep(0.5)
     if use_vdl:
         log_writer.close()
+    if local_rank == 0 and ckpt_proc.exitcode != 0:
+        raise RuntimeError(
+            'The checkpoint worker exited with code {}, some checkpoints may not have been saved.'
+            .format(ckpt_proc.exitcode))
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy as np
@@ -86,6 +87,24 @@ def evaluate(model,
     progbar_val = progbar.Progbar(target=total_iters, verbose=1)
     reader_cost_averager = TimeAverager()
     batch_cost_averager = TimeAverager()
+
+    def update_metrics(alpha_pred, alpha_gt, trimap, img_name):
+        alpha_pred = np.round(alpha_pred * 255)
+        mse_metric.update(alpha_pred, alpha_gt, trimap)
+        sad_metric.update(alpha_pred, alpha_gt, trimap)
+
+        if save_results:
+            alpha_pred_one = alpha_pred[0].squeeze()
+            if trimap is not None:
+                trimap = trimap.squeeze().astype('uint8')
+                alpha_pred_one[trimap == 255] = 255
+                alpha_pred_one[trimap == 0] = 0
+            save_alpha_pred(alpha_pred_one, os.path.join(save_dir, img_name))
+
+    # The metrics are updated by a background thread, so that the host side
+    # work of a sample overlaps with the forward of the next one.
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = None
     batch_start = time.time()
 
     with paddle.no_grad():
@@ -100,18 +119,10 @@ def evaluate(model,
             trimap = data.get('ori_trimap')
             if trimap is not None:
                 trimap = trimap.numpy().astype('uint8')
-            alpha_pred = np.round(alpha_pred * 255)
-            mse_metric.update(alpha_pred, alpha_gt, trimap)
-            sad_metric.update(alpha_pred, alpha_gt, trimap)
-
-            if save_results:
-                alpha_pred_one = alpha_pred[0].squeeze()
-                if trimap is not None:
-                    trimap = trimap.squeeze().astype('uint8')
-                    alpha_pred_one[trimap == 255] = 255
-                    alpha_pred_one[trimap == 0] = 0
-                save_alpha_pred(alpha_pred_one,
-                                os.path.join(save_dir, data['img_name'][0]))
+            if future is not None:
+                future.result()
+            future = executor.submit(update_metrics, alpha_pred, alpha_gt,
+                                     trimap, data['img_name'][0])
 
             batch_cost_averager.record(
                 time.time() - batch_start, num_samples=len(alpha_gt))
@@ -126,6 +137,9 @@ def evaluate(model,
             batch_cost_averager.reset()
             batch_start = time.time()
 
+    if future is not None:
+        future.result()
+    executor.shutdown()
     mse = mse_metric.evaluate()
     sad = sad_metric.evaluate()
 
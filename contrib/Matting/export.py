@@ -19,7 +19,7 @@ import paddle
 import yaml
 
 from paddleseg.cvlibs import Config
-from paddleseg.utils import logger
+from paddleseg.utils import logger, bfloat16_to_float32
 
 import dataset
 import model
@@ -69,7 +69,7 @@ def main(args):
     net = cfg.model
     net.eval()
     if args.model_path:
-        para_state_dict = paddle.load(args.model_path)
+        para_state_dict = bfloat16_to_float32(paddle.load(args.model_path))
         net.set_dict(para_state_dict)
         logger.info('Loaded trained params of model successfully.')
 
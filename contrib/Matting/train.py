@@ -77,7 +77,7 @@ def parse_args():
         dest='num_workers',
         help='Num workers for data loader',
         type=int,
-        default=0)
+        default=2)
     parser.add_argument(
         '--do_eval',
         dest='do_eval',
@@ -100,6 +100,11 @@ def parse_args():
         help='The iters begin evaluation.',
         default=0,
         type=int)
+    parser.add_argument(
+        '--save_bfloat16',
+        dest='save_bfloat16',
+        help='Whether to save the parameters and Adam moments of the periodic checkpoints in bfloat16',
+        action='store_true')
     parser.add_argument(
         '--seed',
         dest='seed',
@@ -164,7 +169,8 @@ def main(args):
         log_iters=args.log_iters,
         resume_model=args.resume_model,
         save_dir=args.save_dir,
-        eval_begin_iters=args.eval_begin_iters)
+        eval_begin_iters=args.eval_begin_iters,
+        save_bfloat16=args.save_bfloat16)
 
 
 if __name__ == '__main__':
@@ -15,13 +15,16 @@
 import os
 import time
 from collections import deque
+import queue
 import shutil
+import threading
 
 import paddle
 import paddle.nn.functional as F
 
 from paddleseg.utils import (TimeAverager, calculate_eta, resume, logger,
-                             worker_init_fn, train_profiler, op_flops_funs)
+                             worker_init_fn, train_profiler, op_flops_funs,
+                             compute_binary_edge)
 from paddleseg.core.val import evaluate
 
 
@@ -34,6 +37,12 @@ def check_logits_losses(logits_list, losses):
             .format(len_logits, len_losses))
 
 
+def remove_checkpoints(remove_queue):
+    """Remove the checkpoint directories put on `remove_queue` until a `None` is received."""
+    for path in iter(remove_queue.get, None):
+        shutil.rmtree(path)
+
+
 def loss_computation(logits_list, labels, losses, edges=None):
     check_logits_losses(logits_list, losses)
     loss_list = []
@@ -100,10 +109,9 @@ def train(model,
     if resume_model is not None:
         start_iter = resume(model, optimizer, resume_model)
 
-    if not os.path.isdir(save_dir):
-        if os.path.exists(save_dir):
-            os.remove(save_dir)
-        os.makedirs(save_dir)
+    if os.path.isfile(save_dir):
+        os.remove(save_dir)
+    os.makedirs(save_dir, exist_ok=True)
 
     if nranks > 1:
         paddle.distributed.fleet.init(is_collective=True)
@@ -139,6 +147,12 @@ def train(model,
     reader_cost_averager = TimeAverager()
     batch_cost_averager = TimeAverager()
     save_models = deque()
+    # Stale checkpoints are removed in the background so that slow file
+    # systems do not stall training.
+    remove_queue = queue.Queue()
+    remove_thread = threading.Thread(
+        target=remove_checkpoints, args=(remove_queue, ), daemon=True)
+    remove_thread.start()
     batch_start = time.time()
 
     iter = start_iter
@@ -157,6 +171,9 @@ def train(model,
             edges = None
             if len(data) == 3:
                 edges = data[2].astype('int64')
+            elif getattr(train_dataset, 'edge', False):
+                edges = compute_binary_edge(
+                    labels, radius=2, num_classes=train_dataset.num_classes)
             if hasattr(model, 'data_format') and model.data_format == 'NHWC':
                 images = images.transpose((0, 2, 3, 1))
 
@@ -211,18 +228,18 @@ def train(model,
             train_profiler.add_profiler_step(profiler_options)
 
             model.clear_gradients()
-            avg_loss += loss.numpy()[0]
+            avg_loss += float(loss)
             if not avg_loss_list:
-                avg_loss_list = [l.numpy() for l in loss_list]
+                avg_loss_list = [float(l) for l in loss_list]
             else:
                 for i in range(len(loss_list)):
-                    avg_loss_list[i] += loss_list[i].numpy()
+                    avg_loss_list[i] += float(loss_list[i])
             batch_cost_averager.record(
                 time.time() - batch_start, num_samples=batch_size)
 
             if (iter) % log_iters == 0 and local_rank == 0:
                 avg_loss /= log_iters
-                avg_loss_list = [l[0] / log_iters for l in avg_loss_list]
+                avg_loss_list = [l / log_iters for l in avg_loss_list]
                 remain_iters = iters - iter
                 avg_train_batch_cost = batch_cost_averager.get_average()
                 avg_train_reader_cost = reader_cost_averager.get_average()
@@ -278,7 +295,7 @@ def train(model,
                 save_models.append(current_save_dir)
                 if len(save_models) > keep_checkpoint_max > 0:
                     model_to_remove = save_models.popleft()
-                    shutil.rmtree(model_to_remove)
+                    remove_queue.put(model_to_remove)
 
                 if val_dataset is not None:
                     if mean_iou > best_mean_iou:
@@ -306,5 +323,7 @@ def train(model,
 
     # Sleep for half a second to let dataloader release resources.
     time.sleep(0.5)
+    remove_queue.put(None)
+    remove_thread.join()
     if use_vdl:
         log_writer.close()
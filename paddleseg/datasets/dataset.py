@@ -20,7 +20,6 @@ from PIL import Image
 
 from paddleseg.cvlibs import manager
 from paddleseg.transforms import Compose
-import paddleseg.transforms.functional as F
 
 
 @manager.DATASETS.add_component
@@ -43,6 +42,8 @@ class Dataset(paddle.io.Dataset):
             The annotation file is not necessary in test_path file.
         separator (str, optional): The separator of dataset list. Default: ' '.
         edge (bool, optional): Whether to compute edge while training. Default: False
+        cache_labels (bool, optional): Whether to cache the decoded labels of the evaluation dataset as `.npy` files
+            next to the label images, which are memory-mapped in the following epochs. Default: False
 
         Examples:
 
@@ -60,6 +61,7 @@ class Dataset(paddle.io.Dataset):
                               mode = 'train')
 
     """
+    cache_labels = False
 
     def __init__(self,
                  transforms,
@@ -71,7 +73,8 @@ class Dataset(paddle.io.Dataset):
                  test_path=None,
                  separator=' ',
                  ignore_index=255,
-                 edge=False):
+                 edge=False,
+                 cache_labels=False):
         self.dataset_root = dataset_root
         self.transforms = Compose(transforms)
         self.file_list = list()
@@ -80,6 +83,7 @@ class Dataset(paddle.io.Dataset):
         self.num_classes = num_classes
         self.ignore_index = ignore_index
         self.edge = edge
+        self.cache_labels = cache_labels
 
         if mode.lower() not in ['train', 'val', 'test']:
             raise ValueError(
@@ -125,6 +129,8 @@ class Dataset(paddle.io.Dataset):
             else:
                 file_path = test_path
 
+        # Join the paths by concatenation since the root is the same for all of them.
+        root = os.path.join(self.dataset_root, '')
         with open(file_path, 'r') as f:
             for line in f:
                 items = line.strip().split(separator)
@@ -133,12 +139,9 @@ class Dataset(paddle.io.Dataset):
                         raise ValueError(
                             "File list format incorrect! In training or evaluation task it should be"
                             " image_name{}label_name\\n".format(separator))
-                    image_path = os.path.join(self.dataset_root, items[0])
-                    label_path = None
+                    self.file_list.append([root + items[0], None])
                 else:
-                    image_path = os.path.join(self.dataset_root, items[0])
-                    label_path = os.path.join(self.dataset_root, items[1])
-                self.file_list.append([image_path, label_path])
+                    self.file_list.append([root + items[0], root + items[1]])
 
     def __getitem__(self, idx):
         image_path, label_path = self.file_list[idx]
@@ -148,17 +151,35 @@ class Dataset(paddle.io.Dataset):
             return im, image_path
         elif self.mode == 'val':
             im, _ = self.transforms(im=image_path)
-            label = np.asarray(Image.open(label_path))
+            label = self._load_label(label_path)
             label = label[np.newaxis, :, :]
             return im, label
         else:
+            # The edges are computed on the device by the training loop when `self.edge` is True.
             im, label = self.transforms(im=image_path, label=label_path)
-            if self.edge:
-                edge_mask = F.mask_to_binary_edge(
-                    label, radius=2, num_classes=self.num_classes)
-                return im, label, edge_mask
-            else:
-                return im, label
+            return im, label
+
+    def _load_label(self, label_path):
+        if not self.cache_labels:
+            return np.asarray(Image.open(label_path))
+
+        cache_path = label_path + '.npy'
+        if os.path.exists(cache_path) and os.path.getmtime(
+                cache_path) >= os.path.getmtime(label_path):
+            return np.load(cache_path, mmap_mode='r')
+
+        label = np.asarray(Image.open(label_path))
+        # Write to a temporary file first as several workers may cache the same label.
+        tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, label)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            # The dataset directory may be read-only, just skip caching.
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return label
 
     def __len__(self):
         return len(self.file_list)
@@ -14,6 +14,7 @@
 
 import contextlib
 import filelock
+import functools
 import os
 import tempfile
 import numpy as np
@@ -34,6 +35,23 @@ def generate_tempdir(directory: str = None, **kwargs):
         yield _dir
 
 
+# The key under which a checkpoint lists the entries saved in bfloat16.
+BFLOAT16_KEYS = 'BFloat16Keys@@'
+
+
+def bfloat16_to_float32(state_dict):
+    """
+    Convert the entries of a loaded state dict that are listed under `BFLOAT16_KEYS`, which are bfloat16 values
+    stored as uint16, to float32. State dicts without this marker are returned unchanged.
+    """
+    for key in state_dict.pop(BFLOAT16_KEYS, []):
+        value = state_dict[key]
+        if isinstance(value, paddle.Tensor):
+            value = value.numpy()
+        state_dict[key] = (value.astype(np.uint32) << 16).view(np.float32)
+    return state_dict
+
+
 def load_entire_model(model, pretrained):
     if pretrained is not None:
         load_pretrained_model(model, pretrained)
@@ -66,7 +84,7 @@ def load_pretrained_model(model, pretrained_model):
                                                     'model.pdparams')
 
         if os.path.exists(pretrained_model):
-            para_state_dict = paddle.load(pretrained_model)
+            para_state_dict = bfloat16_to_float32(paddle.load(pretrained_model))
 
             model_state_dict = model.state_dict()
             keys = model_state_dict.keys()
@@ -104,9 +122,9 @@ def resume(model, optimizer, resume_model):
         if os.path.exists(resume_model):
             resume_model = os.path.normpath(resume_model)
             ckpt_path = os.path.join(resume_model, 'model.pdparams')
-            para_state_dict = paddle.load(ckpt_path)
+            para_state_dict = bfloat16_to_float32(paddle.load(ckpt_path))
             ckpt_path = os.path.join(resume_model, 'model.pdopt')
-            opti_state_dict = paddle.load(ckpt_path)
+            opti_state_dict = bfloat16_to_float32(paddle.load(ckpt_path))
             model.set_state_dict(para_state_dict)
             optimizer.set_state_dict(opti_state_dict)
 
@@ -125,6 +143,52 @@ def worker_init_fn(worker_id):
     np.random.seed(random.randint(0, 100000))
 
 
+@functools.lru_cache(maxsize=None)
+def _binary_edge_kernel(radius, num_classes):
+    r = int(radius)
+    offsets = paddle.arange(-r, r + 1, dtype='float32')
+    dist = offsets.unsqueeze(1)**2 + offsets.unsqueeze(0)**2
+    kernel = (dist <= radius**2).astype('float32')
+    area = float(kernel.sum())
+    weight = kernel.reshape([1, 1, 2 * r + 1, 2 * r + 1]).tile(
+        [num_classes, 1, 1, 1])
+    weight.stop_gradient = True
+    return weight, area
+
+
+def compute_binary_edge(labels, radius, num_classes):
+    """
+    Convert a batch of label masks to binary edge masks on the device.
+    It is the batched counterpart of `paddleseg.transforms.functional.mask_to_binary_edge`.
+
+    Args:
+        labels (paddle.Tensor): Label masks with shape (N, H, W).
+        radius (int|float): Radius of edge.
+        num_classes (int): Number of classes.
+
+    Returns:
+        paddle.Tensor: Edge masks with shape (N, 1, H, W) and dtype int64.
+    """
+    if radius < 1:
+        raise ValueError('`radius` should be greater than or equal to 1')
+    with paddle.no_grad():
+        # The kernel only depends on the arguments, so it is built once.
+        weight, area = _binary_edge_kernel(radius, num_classes)
+        classes = paddle.arange(num_classes, dtype=labels.dtype)
+        onehot = (labels.unsqueeze(1) == classes.reshape([1, -1, 1, 1]))
+        # Count the pixels of every class in the disk around each pixel.
+        # Pixels outside the image count as background, as in the numpy version.
+        count = paddle.nn.functional.conv2d(
+            onehot.astype('float32'),
+            weight,
+            padding=int(radius),
+            groups=num_classes)
+        # A pixel is on an edge if some class only partially covers its disk.
+        edge = paddle.logical_and(count > 0.5, count < area - 0.5)
+        edge = edge.astype('int64').sum(axis=1, keepdim=True) > 0
+    return edge.astype('int64')
+
+
 def get_image_list(image_path):
     """Get image list"""
     valid_suffix = [
@@ -21,7 +21,8 @@ import paddle
 from paddle.distributed import fleet
 import paddle.nn.functional as F
 
-from paddleseg.utils import TimeAverager, calculate_eta, resume, logger, worker_init_fn
+from paddleseg.utils import (TimeAverager, calculate_eta, resume, logger,
+                             worker_init_fn, compute_binary_edge)
 from paddleseg.core.val import evaluate
 from paddleseg.models.losses import DistillCrossEntropyLoss
 
@@ -179,6 +180,9 @@ def distill_train(distill_model,
             edges = None
             if len(data) == 3:
                 edges = data[2].astype('int64')
+            elif getattr(train_dataset, 'edge', False):
+                edges = compute_binary_edge(
+                    labels, radius=2, num_classes=train_dataset.num_classes)
             if hasattr(distill_model,
                        'data_format') and distill_model.data_format == 'NHWC':
                 images = images.transpose((0, 2, 3, 1))